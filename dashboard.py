@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-import json
+import orjson
 import plotly.express as px
 import numpy as np
 import tempfile
+import copy
+import hashlib
+import functools
+import re
 from datetime import datetime
-from collections import defaultdict
 
 # Set page configuration
 st.set_page_config(
@@ -26,88 +29,296 @@ ROLE_COLORS = {
     "System": "#8884FF",
     "Unknown": "#CCCCCC"
 }
+_UNKNOWN_COLOR = ROLE_COLORS["Unknown"]
+
+# Bubble colors in the chat view, keyed by lower-cased source name
+CHAT_ROLE_COLORS = {
+    'ceo': '#FF6B6B',
+    'chat_manager': '#A5A5A5',
+    'cmo': '#FFD166',
+    'cpo': '#06D6A0',
+    'cto': '#4ECDC4',
+    'system': '#8884FF',
+    'initializer': '#8884FF'
+}
+
+@functools.lru_cache(maxsize=4096)
+def _cached_loads(json_str):
+    """Parse a raw JSON string once; repeated payloads are served from the cache"""
+    try:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError:
+        return {}
+
+# Rows fetched from SQLite per round-trip while loading
+READ_CHUNKSIZE = 50_000
+
+# Number of chat bubbles rendered per "Load older" step
+MESSAGE_PAGE_SIZE = 100
+
+# Columns read from each logging table when present; everything else is never used downstream
+TABLE_COLUMNS = {
+    'agents': ['agent_id', 'wrapper_id', 'session_id', 'init_args', 'timestamp'],
+    'chat_completions': [
+        'invocation_id', 'client_id', 'wrapper_id', 'session_id', 'source_name',
+        'request', 'response', 'is_cached', 'cost', 'start_time', 'end_time'
+    ],
+    'events': ['event_name', 'source_id', 'source_name', 'session_id', 'json_state', 'timestamp'],
+    'function_calls': ['source_id', 'source_name', 'function_name', 'args', 'returns', 'timestamp'],
+    'oai_clients': ['client_id', 'wrapper_id', 'session_id', 'init_args', 'timestamp'],
+    'oai_wrappers': ['wrapper_id', 'session_id', 'init_args', 'timestamp']
+}
+
+# Raw JSON text columns and the parsed columns derived from them, per table
+JSON_COLUMNS = {
+    'agents': {'init_args': 'config_dict'},
+    'chat_completions': {'request': 'request_dict', 'response': 'response_dict'},
+    'events': {'json_state': 'state_dict'},
+    'function_calls': {'args': 'args_dict', 'returns': 'returns_dict'},
+    'oai_clients': {'init_args': 'config_dict'},
+    'oai_wrappers': {'init_args': 'config_dict'}
+}
+
+# Styles for the chat view, emitted once per render
+CHAT_CSS = """
+    <style>
+    .chat-container {
+        height: 600px;
+        overflow-y: auto;
+        padding: 15px;
+        background-color: #f8f9fa;
+        border-radius: 10px;
+        border: 1px solid #dee2e6;
+    }
+    .message-bubble {
+        margin: 8px 0;
+        padding: 8px 12px;
+        border-radius: 12px;
+        max-width: 85%;
+        font-size: 0.85em;
+        line-height: 1.3;
+        box-shadow: 0 1px 2px rgba(0,0,0,0.1);
+    }
+    .message-header {
+        font-size: 0.8em;
+        font-weight: 600;
+        margin-bottom: 3px;
+    }
+    .message-content {
+        font-size: 0.85em;
+        line-height: 1.3;
+        white-space: pre-wrap;
+    }
+    .message-time {
+        font-size: 0.7em;
+        color: #666;
+        margin-top: 3px;
+        text-align: right;
+    }
+    .code-block {
+        background-color: #f8f9fa;
+        padding: 8px;
+        border-radius: 4px;
+        font-family: monospace;
+        font-size: 0.8em;
+        margin: 4px 0;
+        overflow-x: auto;
+    }
+    </style>
+"""
+
+# Chat-view message bubble; a single unindented line so the batched markup stays one HTML block
+BUBBLE_TEMPLATE = (
+    '<div class="message-bubble" style="{alignment} background-color: {background}; border-left: 3px solid {color};">'
+    '<div class="message-header" style="color: {color};">{sender} ({role})</div>'
+    '<div class="message-content">{content}</div>'
+    '<div class="message-time">{time}</div>'
+    '</div>'
+)
+
+# Text between ``` fences (an unclosed fence runs to the end of the message)
+CODE_FENCE_PATTERN = re.compile(r'```(.*?)(?:```|\Z)', re.DOTALL)
+
+# Id columns that tie rows without a session_id back to a session, per table
+SESSION_ID_COLUMNS = {
+    'agents': ('wrapper_id', 'agent_id'),
+    'oai_clients': ('client_id', 'wrapper_id'),
+    'oai_wrappers': ('wrapper_id',)
+}
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = {
+    'chat_completions': ['source_name', 'session_id'],
+    'events': ['event_name', 'source_name'],
+    'function_calls': ['source_name']
+}
+
+# Plotly configs: summary bar charts render as static images, the rest keep hover only
+STATIC_CHART_CONFIG = {'staticPlot': True, 'displayModeBar': False}
+HOVER_CHART_CONFIG = {'scrollZoom': False, 'displaylogo': False, 'displayModeBar': False}
 
 def safe_json_loads(json_str):
     """Safely parse JSON strings with error handling"""
     if isinstance(json_str, dict):
         return json_str
+    if not json_str or not isinstance(json_str, (bytes, str)):
+        return {}
+    if isinstance(json_str, str):
+        # Shallow copy so callers never mutate the cached object
+        return copy.copy(_cached_loads(json_str))
     try:
-        return json.loads(str(json_str)) if json_str else {}
-    except (json.JSONDecodeError, TypeError):
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError:
         return {}
 
-def load_database(uploaded_file):
-    """Load and preprocess the SQLite database"""
+def table_columns(conn, table):
+    """Names of the columns a table actually has in this database"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def read_table(conn, table, filter_col=None, values=()):
+    """Stream a table from SQLite in chunks, parsing its JSON columns as each chunk arrives"""
+    available = table_columns(conn, table)
+    columns = [col for col in TABLE_COLUMNS[table] if col in available]
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params = []
+    if filter_col is not None:
+        params = list(values)
+        query += f" WHERE {filter_col} IN ({', '.join('?' * len(params))})"
+    chunks = []
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=READ_CHUNKSIZE):
+        for raw_col, parsed_col in JSON_COLUMNS[table].items():
+            chunk[parsed_col] = chunk[raw_col].map(safe_json_loads)
+        chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True)
+
+def map_ids_to_session(tables):
+    """Map agent/client/wrapper ids to the session they were logged in"""
+    id_to_session = {}
+    for table, id_cols in SESSION_ID_COLUMNS.items():
+        df = tables.get(table)
+        if df is None or df.empty or 'session_id' not in df.columns:
+            continue
+        df = df.dropna(subset=['session_id'])
+        for col in id_cols:
+            if col in df.columns:
+                ids = df[col].notna()
+                id_to_session.update(dict(zip(df.loc[ids, col], df.loc[ids, 'session_id'])))
+    return id_to_session
+
+def read_session_tables(conn, session_ids):
+    """Load only the rows belonging to the given sessions"""
+    tables = {
+        table: read_table(conn, table, 'session_id', session_ids)
+        for table in ('agents', 'chat_completions', 'oai_clients', 'oai_wrappers')
+    }
+    # Function calls carry no session_id; match them on the ids of the session's agents/clients.
+    # Events are filtered on their own session_id when the schema logs one, and fall back to
+    # the same id match otherwise
+    source_ids = list(map_ids_to_session(tables))
+    if 'session_id' in table_columns(conn, 'events'):
+        tables['events'] = read_table(conn, 'events', 'session_id', session_ids)
+    else:
+        tables['events'] = read_table(conn, 'events', 'source_id', source_ids)
+    tables['function_calls'] = read_table(conn, 'function_calls', 'source_id', source_ids)
+    return tables
+
+def frame_cache_key(df):
+    """Cheap cache key for a DataFrame passed to a cached function"""
+    # Parsed JSON columns hold dicts pandas cannot hash; they are covered by the
+    # key of the database the frame was loaded from
+    parsed_cols = {col for cols in JSON_COLUMNS.values() for col in cols.values()}
+    hashable = df[[col for col in df.columns if col not in parsed_cols]]
+    return (
+        df.attrs.get('source_key'),
+        df.shape,
+        tuple(df.columns),
+        int(pd.util.hash_pandas_object(hashable, index=False).sum())
+    )
+
+# Hash DataFrame arguments by key instead of pickling their (unhashable) JSON columns
+CACHE_HASH_FUNCS = {pd.DataFrame: frame_cache_key}
+
+def load_database(file_bytes, session_ids=None):
+    """Load and preprocess the SQLite database, optionally restricted to some sessions"""
+    file_hash = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+    return _load_database(file_hash, file_bytes, None if session_ids is None else tuple(session_ids))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _load_database(file_hash, _file_bytes, session_ids):
+    """Parse the database contents; cached on the content hash so reruns skip the work"""
     try:
         # Create temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp:
-            tmp.write(uploaded_file.getvalue())
+            tmp.write(_file_bytes)
             tmp_path = tmp.name
         
         conn = sqlite3.connect(tmp_path)
         
         # Load all tables
-        tables = {
-            'agents': pd.read_sql_query('SELECT * FROM agents', conn),
-            'chat_completions': pd.read_sql_query('SELECT * FROM chat_completions', conn),
-            'events': pd.read_sql_query('SELECT * FROM events', conn),
-            'function_calls': pd.read_sql_query('SELECT * FROM function_calls', conn),
-            'oai_clients': pd.read_sql_query('SELECT * FROM oai_clients', conn),
-            'oai_wrappers': pd.read_sql_query('SELECT * FROM oai_wrappers', conn)
-        }
+        if session_ids is None:
+            tables = {table: read_table(conn, table) for table in TABLE_COLUMNS}
+        else:
+            tables = read_session_tables(conn, session_ids)
         conn.close()
         
         # Convert timestamps
         for df in tables.values():
-            for col in df.columns:
-                if 'time' in col.lower() or 'timestamp' in col.lower():
-                    df[col] = pd.to_datetime(df[col])
-        
-        # Parse JSON fields
-        tables['agents']['config_dict'] = tables['agents']['init_args'].apply(safe_json_loads)
-        tables['chat_completions']['request_dict'] = tables['chat_completions']['request'].apply(safe_json_loads)
-        tables['chat_completions']['response_dict'] = tables['chat_completions']['response'].apply(safe_json_loads)
-        tables['events']['state_dict'] = tables['events']['json_state'].apply(safe_json_loads)
-        tables['function_calls']['args_dict'] = tables['function_calls']['args'].apply(safe_json_loads)
-        tables['function_calls']['returns_dict'] = tables['function_calls']['returns'].apply(safe_json_loads)
-        tables['oai_clients']['config_dict'] = tables['oai_clients']['init_args'].apply(safe_json_loads)
-        tables['oai_wrappers']['config_dict'] = tables['oai_wrappers']['init_args'].apply(safe_json_loads)
+            time_cols = [col for col in df.columns if 'time' in col.lower()]
+            if time_cols:
+                df[time_cols] = df[time_cols].apply(pd.to_datetime, format='ISO8601', cache=True)
+        
+        # Store repeated labels as categoricals
+        for table, cols in CATEGORY_COLUMNS.items():
+            df = tables[table]
+            present = [col for col in cols if col in df.columns]
+            if present:
+                df[present] = df[present].astype('category')
+        
+        # Flag failed code executions while the event state is still raw text
+        events = tables['events']
+        events['has_exitcode'] = events['json_state'].str.contains('exitcode', regex=False, na=False)
         
         # Enrich chat completions
         cc = tables['chat_completions']
         if not cc.empty:
             cc['duration'] = (cc['end_time'] - cc['start_time']).dt.total_seconds()
             cc['date'] = cc['start_time'].dt.date
-            cc['hour'] = cc['start_time'].dt.hour
+            cc['hour'] = cc['start_time'].dt.hour.astype('Int8')
             cc['day_of_week'] = cc['start_time'].dt.day_name()
-            cc['request_size'] = cc['request'].apply(lambda x: len(str(x)))
-            cc['response_size'] = cc['response'].apply(lambda x: len(str(x)))
+            cc['model'] = cc['request_dict'].map(
+                lambda x: x.get('model', 'Unknown') if isinstance(x, dict) else 'Unknown'
+            ).astype('category')
+            cc['request_size'] = cc['request'].astype('string').str.len().fillna(0).astype('int64')
+            cc['response_size'] = cc['response'].astype('string').str.len().fillna(0).astype('int64')
             if 'source_name' in cc.columns:
-                cc['source_name'] = cc['source_name'].str.upper().str.strip()
+                # Normalize each distinct label once rather than every row
+                cc['source_name'] = cc['source_name'].map(
+                    lambda x: x.upper().strip(), na_action='ignore'
+                ).astype('category')
             
             # Token extraction
-            def extract_tokens(response_dict):
-                usage = response_dict.get('usage', {})
-                return (
-                    int(usage.get('total_tokens', 0)),
-                    int(usage.get('prompt_tokens', 0)),
-                    int(usage.get('completion_tokens', 0))
-                )
-            
-            cc[['total_tokens', 'prompt_tokens', 'completion_tokens']] = cc['response_dict'].apply(
-                lambda x: pd.Series(extract_tokens(x))
+            token_cols = ['total_tokens', 'prompt_tokens', 'completion_tokens']
+            empty = {}
+            usage = pd.DataFrame.from_records(
+                [response.get('usage') or empty for response in cc['response_dict']],
+                columns=token_cols
             )
+            cc[token_cols] = usage.fillna(0).astype('int64').to_numpy()
             
-            cc['cost_per_token'] = np.where(
-                cc['total_tokens'] > 0,
-                cc['cost'] / cc['total_tokens'],
-                0
-            )
-            cc['completion_ratio'] = np.where(
-                cc['total_tokens'] > 0,
-                cc['completion_tokens'] / cc['total_tokens'],
-                0
-            )
+            # Divide only where tokens were used; other rows stay 0
+            total_tokens = cc['total_tokens'].to_numpy()
+            has_tokens = total_tokens > 0
+            cost_per_token = np.zeros(len(cc))
+            np.divide(cc['cost'].to_numpy(dtype='float64'), total_tokens, out=cost_per_token, where=has_tokens)
+            cc['cost_per_token'] = cost_per_token
+            completion_ratio = np.zeros(len(cc))
+            np.divide(cc['completion_tokens'].to_numpy(), total_tokens, out=completion_ratio, where=has_tokens)
+            cc['completion_ratio'] = completion_ratio
+        
+        # Raw JSON text is no longer needed once parsed and measured
+        for table, json_cols in JSON_COLUMNS.items():
+            tables[table].drop(columns=list(json_cols), inplace=True)
+            tables[table].attrs['source_key'] = (table, file_hash, session_ids)
         
         return tables
     
@@ -122,208 +333,224 @@ def load_database(uploaded_file):
             except:
                 pass
 
+def _columns(df, defaults):
+    """Return one list per requested column, substituting a default for missing columns"""
+    return [df[col].tolist() if col in df.columns else [default] * len(df) for col, default in defaults.items()]
+
+@st.cache_data(max_entries=4, show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def build_unified_events(tables):
+    """Collect events from every table into one chronologically sorted DataFrame"""
+    id_to_session = map_ids_to_session(tables)
+
+    # Process DataFrames into per-table event frames
+    frames = []
+
+    df = tables.get('agents')
+    if df is not None and not df.empty and {'timestamp', 'session_id', 'wrapper_id'} <= set(df.columns):
+        timestamps, session_ids, wrapper_ids, source_names, configs, class_names, agent_ids = _columns(df, {
+            'timestamp': None, 'session_id': None, 'wrapper_id': None, 'source_name': 'Agent',
+            'config_dict': {}, 'agent_class_name': 'Unknown', 'agent_id': None
+        })
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'session_id': session_ids,
+            'type': 'agent_config',
+            'source_name': source_names,
+            'source_id': wrapper_ids,
+            'details': [
+                {'config': config, 'class': class_name, 'agent_id': agent_id}
+                for config, class_name, agent_id in zip(configs, class_names, agent_ids)
+            ]
+        }))
+
+    df = tables.get('events')
+    if df is not None and not df.empty and {'timestamp', 'session_id', 'source_id'} <= set(df.columns):
+        timestamps, session_ids, source_ids, source_names, event_names, states, exitcodes = _columns(df, {
+            'timestamp': None, 'session_id': None, 'source_id': None, 'source_name': 'Unknown',
+            'event_name': 'Unknown', 'state_dict': {}, 'has_exitcode': False
+        })
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'session_id': session_ids,
+            'type': ['event_received_message' if name == 'received_message' else 'event_other' for name in event_names],
+            'source_name': source_names,
+            'source_id': source_ids,
+            'details': [
+                {'event_name': event_name, 'data': state}
+                for event_name, state in zip(event_names, states)
+            ],
+            'has_exitcode': exitcodes
+        }))
+
+    df = tables.get('chat_completions')
+    if df is not None and not df.empty and {'start_time', 'session_id', 'client_id', 'invocation_id'} <= set(df.columns):
+        (start_times, end_times, session_ids, client_ids, invocation_ids, source_names,
+         requests, models, responses, costs, latencies, cached, wrapper_ids) = _columns(df, {
+            'start_time': None, 'end_time': None, 'session_id': None, 'client_id': None,
+            'invocation_id': None, 'source_name': 'Unknown', 'request_dict': {}, 'model': 'Unknown', 'response_dict': {},
+            'cost': 0, 'latency': 0, 'is_cached': False, 'wrapper_id': None
+        })
+        common = {
+            'session_id': session_ids,
+            'source_name': source_names,
+            'source_id': client_ids,
+            'invocation_id': invocation_ids
+        }
+        starts = pd.DataFrame({
+            'timestamp': start_times,
+            'type': 'llm_call_start',
+            **common,
+            'details': [
+                {'request': request, 'model': model, 'wrapper_id': wrapper_id}
+                for request, model, wrapper_id in zip(requests, models, wrapper_ids)
+            ]
+        })
+        ends = pd.DataFrame({
+            'timestamp': end_times,
+            'type': 'llm_call_end',
+            **common,
+            'details': [
+                {'response': response, 'cost': cost, 'latency': latency, 'is_cached': is_cached, 'wrapper_id': wrapper_id}
+                for response, cost, latency, is_cached, wrapper_id in zip(responses, costs, latencies, cached, wrapper_ids)
+            ]
+        })
+        # Interleave so each call's start precedes its end when timestamps tie
+        frames.append(pd.concat([starts, ends]).sort_index(kind='stable'))
+
+    df = tables.get('function_calls')
+    if df is not None and not df.empty and 'timestamp' in df.columns:
+        timestamps, source_ids, source_names, function_names, args, returns = _columns(df, {
+            'timestamp': None, 'source_id': None, 'source_name': 'Unknown',
+            'function_name': 'Unknown', 'args_dict': {}, 'returns_dict': {}
+        })
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'session_id': [id_to_session.get(source_id) if source_id else None for source_id in source_ids],
+            'type': 'function_call',
+            'source_name': source_names,
+            'source_id': source_ids,
+            'details': [
+                {'function_name': function_name, 'args': arg, 'returns': ret}
+                for function_name, arg, ret in zip(function_names, args, returns)
+            ]
+        }))
+
+    df = tables.get('oai_clients')
+    if df is not None and not df.empty and {'timestamp', 'session_id', 'client_id'} <= set(df.columns):
+        timestamps, session_ids, client_ids, configs, wrapper_ids = _columns(df, {
+            'timestamp': None, 'session_id': None, 'client_id': None, 'config_dict': {}, 'wrapper_id': None
+        })
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'session_id': session_ids,
+            'type': 'client_config',
+            'source_name': 'System',
+            'source_id': client_ids,
+            'details': [
+                {'config': config, 'wrapper_id': wrapper_id}
+                for config, wrapper_id in zip(configs, wrapper_ids)
+            ]
+        }))
+
+    df = tables.get('oai_wrappers')
+    if df is not None and not df.empty and {'timestamp', 'session_id', 'wrapper_id'} <= set(df.columns):
+        timestamps, session_ids, wrapper_ids, configs = _columns(df, {
+            'timestamp': None, 'session_id': None, 'wrapper_id': None, 'config_dict': {}
+        })
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'session_id': session_ids,
+            'type': 'wrapper_config',
+            'source_name': 'System',
+            'source_id': wrapper_ids,
+            'details': [{'config': config} for config in configs]
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['timestamp', 'session_id', 'type', 'source_name', 'source_id', 'details', 'has_exitcode', 'role'])
+
+    unified = pd.concat(frames, ignore_index=True)
+    unified = unified[unified['timestamp'].notna() & unified['session_id'].notna()]
+    unified['type'] = unified['type'].astype('category')
+    unified['has_exitcode'] = unified['has_exitcode'].eq(True) if 'has_exitcode' in unified.columns else False
+    # Role is the last underscore-separated part of the source name, e.g. "agent_CEO" -> "CEO"
+    unified['role'] = unified['source_name'].str.rsplit('_', n=1).str[-1]
+    return unified.sort_values('timestamp', kind='stable')
+
+@st.cache_data(max_entries=4, show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
 def build_unified_session_view(tables):
     """Create a unified chronological view of all session events"""
-    unified_events = []
-    id_to_session = {}
+    unified = build_unified_events(tables)
+    return {
+        session_id: group.to_dict('records')
+        for session_id, group in unified.groupby('session_id', sort=False)
+    }
 
-    # Build ID to Session Mapping
-    if 'agents' in tables and not tables['agents'].empty:
-        for _, row in tables['agents'].iterrows():
-            if 'session_id' in row and pd.notna(row['session_id']):
-                session_id = row['session_id']
-                if 'wrapper_id' in row and pd.notna(row['wrapper_id']):
-                    id_to_session[row['wrapper_id']] = session_id
-                if 'agent_id' in row and pd.notna(row['agent_id']):
-                    id_to_session[row['agent_id']] = session_id
-
-    if 'oai_clients' in tables and not tables['oai_clients'].empty:
-        for _, row in tables['oai_clients'].iterrows():
-            if 'session_id' in row and pd.notna(row['session_id']):
-                session_id = row['session_id']
-                if 'client_id' in row and pd.notna(row['client_id']):
-                    id_to_session[row['client_id']] = session_id
-                if 'wrapper_id' in row and pd.notna(row['wrapper_id']):
-                    id_to_session[row['wrapper_id']] = session_id
-
-    if 'oai_wrappers' in tables and not tables['oai_wrappers'].empty:
-        for _, row in tables['oai_wrappers'].iterrows():
-            if 'session_id' in row and pd.notna(row['session_id']):
-                session_id = row['session_id']
-                if 'wrapper_id' in row and pd.notna(row['wrapper_id']):
-                    id_to_session[row['wrapper_id']] = session_id
-
-    # Process DataFrames into Unified List
-    if 'agents' in tables and not tables['agents'].empty:
-        for _, row in tables['agents'].iterrows():
-            if 'timestamp' in row and 'session_id' in row and 'wrapper_id' in row:
-                unified_events.append({
-                    'timestamp': row['timestamp'],
-                    'session_id': row['session_id'],
-                    'type': 'agent_config',
-                    'source_name': row.get('source_name', 'Agent'),
-                    'source_id': row['wrapper_id'],
-                    'details': {
-                        'config': row.get('config_dict', {}),
-                        'class': row.get('agent_class_name', 'Unknown'),
-                        'agent_id': row.get('agent_id')
-                    }
-                })
-
-    if 'events' in tables and not tables['events'].empty:
-        for _, row in tables['events'].iterrows():
-            if 'timestamp' in row and 'session_id' in row and 'source_id' in row:
-                event_type = 'event_received_message' if row.get('event_name') == 'received_message' else 'event_other'
-                unified_events.append({
-                    'timestamp': row['timestamp'],
-                    'session_id': row['session_id'],
-                    'type': event_type,
-                    'source_name': row.get('source_name', 'Unknown'),
-                    'source_id': row['source_id'],
-                    'details': {
-                        'event_name': row.get('event_name', 'Unknown'),
-                        'data': row.get('state_dict', {})
-                    }
-                })
-
-    if 'chat_completions' in tables and not tables['chat_completions'].empty:
-        for _, row in tables['chat_completions'].iterrows():
-            if 'start_time' in row and 'session_id' in row and 'client_id' in row and 'invocation_id' in row:
-                unified_events.append({
-                    'timestamp': row['start_time'],
-                    'session_id': row['session_id'],
-                    'type': 'llm_call_start',
-                    'source_name': row.get('source_name', 'Unknown'),
-                    'source_id': row['client_id'],
-                    'invocation_id': row['invocation_id'],
-                    'details': {
-                        'request': row.get('request_dict', {}),
-                        'model': row.get('request_dict', {}).get('model', 'Unknown'),
-                        'wrapper_id': row.get('wrapper_id')
-                    }
-                })
-                unified_events.append({
-                    'timestamp': row['end_time'],
-                    'session_id': row['session_id'],
-                    'type': 'llm_call_end',
-                    'source_name': row.get('source_name', 'Unknown'),
-                    'source_id': row['client_id'],
-                    'invocation_id': row['invocation_id'],
-                    'details': {
-                        'response': row.get('response_dict', {}),
-                        'cost': row.get('cost', 0),
-                        'latency': row.get('latency', 0),
-                        'is_cached': row.get('is_cached', False),
-                        'wrapper_id': row.get('wrapper_id')
-                    }
-                })
-
-    if 'function_calls' in tables and not tables['function_calls'].empty:
-        for _, row in tables['function_calls'].iterrows():
-            source_id = row.get('source_id')
-            session_id = id_to_session.get(source_id) if source_id else None
-
-            if session_id and 'timestamp' in row:
-                unified_events.append({
-                    'timestamp': row['timestamp'],
-                    'session_id': session_id,
-                    'type': 'function_call',
-                    'source_name': row.get('source_name', 'Unknown'),
-                    'source_id': source_id,
-                    'details': {
-                        'function_name': row.get('function_name', 'Unknown'),
-                        'args': row.get('args_dict', {}),
-                        'returns': row.get('returns_dict', {})
-                    }
-                })
-
-    if 'oai_clients' in tables and not tables['oai_clients'].empty:
-        for _, row in tables['oai_clients'].iterrows():
-            if 'timestamp' in row and 'session_id' in row and 'client_id' in row:
-                unified_events.append({
-                    'timestamp': row['timestamp'],
-                    'session_id': row['session_id'],
-                    'type': 'client_config',
-                    'source_name': 'System',
-                    'source_id': row['client_id'],
-                    'details': {
-                        'config': row.get('config_dict', {}),
-                        'wrapper_id': row.get('wrapper_id')
-                    }
-                })
-
-    if 'oai_wrappers' in tables and not tables['oai_wrappers'].empty:
-        for _, row in tables['oai_wrappers'].iterrows():
-            if 'timestamp' in row and 'session_id' in row and 'wrapper_id' in row:
-                unified_events.append({
-                    'timestamp': row['timestamp'],
-                    'session_id': row['session_id'],
-                    'type': 'wrapper_config',
-                    'source_name': 'System',
-                    'source_id': row['wrapper_id'],
-                    'details': {
-                        'config': row.get('config_dict', {})
-                    }
-                })
-
-    # Group by session and sort chronologically
-    session_data = defaultdict(list)
-    valid_events = [e for e in unified_events if pd.notna(e.get('timestamp'))]
-    for event in sorted(valid_events, key=lambda x: x['timestamp']):
-        if pd.notna(event.get('session_id')):
-            session_data[event['session_id']].append(event)
-    
-    return session_data
-
-def calculate_session_metrics(session_id, session_events, chat_completions_df):
-    """Calculate summary metrics for a session"""
-    if not session_events:
-        return {}
-    
-    # Basic timing
-    start_time = min(e['timestamp'] for e in session_events)
-    end_time = max(e['timestamp'] for e in session_events)
-    duration = (end_time - start_time).total_seconds()
+def _unique_per_session(values, session_ids, index):
+    """List the distinct values seen in each session, in index order"""
+    grouped = values.groupby(session_ids, sort=False).unique()
+    return [list(grouped.get(session_id, [])) for session_id in index]
+
+@st.cache_data(max_entries=4, show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def calculate_all_session_metrics(tables):
+    """Calculate summary metrics for every session in one grouped pass"""
+    unified = build_unified_events(tables)
+    if unified.empty:
+        return pd.DataFrame()
     
-    # Count different event types
-    event_counts = defaultdict(int)
-    agent_names = set()
-    function_names = set()
-    llm_models = set()
-    status = 'Completed'
+    session_ids = unified['session_id']
+    types = unified['type']
+    is_message = types.eq('event_received_message')
+    is_function = types.eq('function_call')
+    is_llm_start = types.eq('llm_call_start')
+    details = unified['details']
     
-    for event in session_events:
-        event_counts[event['type']] += 1
-        agent_names.add(event['source_name'])
-        
-        if event['type'] == 'function_call':
-            function_names.add(event['details']['function_name'])
-        elif event['type'] == 'llm_call_start':
-            llm_models.add(event['details']['model'])
-        elif event['type'] == 'event_received_message':
-            if 'exitcode' in str(event['details']['data']):
-                status = 'Failed'
+    # Per-type counters, failure flag and time span in a single grouped aggregation
+    flags = pd.DataFrame({
+        'is_message': is_message,
+        'is_llm_start': is_llm_start,
+        'is_function': is_function,
+        'failed': is_message & unified['has_exitcode'],
+        'timestamp': unified['timestamp']
+    })
+    metrics = flags.groupby(session_ids, sort=False).agg(
+        num_messages=('is_message', 'sum'),
+        num_llm_calls=('is_llm_start', 'sum'),
+        num_function_calls=('is_function', 'sum'),
+        failed=('failed', 'sum'),
+        start_time=('timestamp', 'min'),
+        end_time=('timestamp', 'max')
+    )
+    index = metrics.index
     
-    # Get cost/token metrics from chat completions
-    session_cc = chat_completions_df[chat_completions_df['session_id'] == session_id]
-    total_cost = session_cc['cost'].sum()
-    total_tokens = session_cc['total_tokens'].sum()
+    # Cost/token totals from chat completions
+    cc = tables['chat_completions']
+    if 'total_tokens' in cc.columns:
+        totals = cc.groupby('session_id', observed=True, sort=False).agg(
+            cost=('cost', 'sum'), total_tokens=('total_tokens', 'sum')
+        ).reindex(index, fill_value=0)
+    else:
+        totals = pd.DataFrame({'cost': 0.0, 'total_tokens': 0}, index=index)
     
-    return {
-        'session_id': session_id,
-        'start_time': start_time,
-        'end_time': end_time,
-        'duration': duration,
-        'status': status,
-        'num_messages': event_counts.get('event_received_message', 0),
-        'num_llm_calls': event_counts.get('llm_call_start', 0),
-        'num_function_calls': event_counts.get('function_call', 0),
-        'agents': list(agent_names),
-        'functions': list(function_names),
-        'models': list(llm_models),
-        'total_cost': total_cost,
-        'total_tokens': total_tokens
-    }
+    return pd.DataFrame({
+        'session_id': index,
+        'start_time': metrics['start_time'].to_numpy(),
+        'end_time': metrics['end_time'].to_numpy(),
+        'duration': (metrics['end_time'] - metrics['start_time']).dt.total_seconds().to_numpy(),
+        'status': np.where(metrics['failed'] > 0, 'Failed', 'Completed'),
+        'num_messages': metrics['num_messages'].to_numpy(),
+        'num_llm_calls': metrics['num_llm_calls'].to_numpy(),
+        'num_function_calls': metrics['num_function_calls'].to_numpy(),
+        'agents': _unique_per_session(unified['source_name'], session_ids, index),
+        'functions': _unique_per_session(
+            details[is_function].map(lambda d: d['function_name']), session_ids[is_function], index
+        ),
+        'models': _unique_per_session(
+            details[is_llm_start].map(lambda d: d['model']), session_ids[is_llm_start], index
+        ),
+        'total_cost': totals['cost'].to_numpy(),
+        'total_tokens': totals['total_tokens'].to_numpy()
+    })
 
 def display_session_metrics(metrics):
     """Display summary metrics for a session"""
@@ -355,61 +582,93 @@ def display_session_metrics(metrics):
         for model in metrics['models']:
             st.write(f"- {model}")
 
-def enhanced_render_event(event):
-    """Enhanced event rendering with role-based styling"""
-    timestamp = event['timestamp'].strftime('%H:%M:%S.%f')[:-3]
-    source = event['source_name']
-    role = source.split('_')[-1] if '_' in source else source
-    details = event['details']
-    color = ROLE_COLORS.get(role, ROLE_COLORS["Unknown"])
+@functools.lru_cache(maxsize=8192)
+def event_bubble_html(event_type, timestamp, source, role, sender='', content='', model='', function_name=''):
+    """Build the HTML bubble for an event; unchanged events are served from the cache on reruns"""
+    role_colors = ROLE_COLORS
+    color = role_colors.get(role, _UNKNOWN_COLOR)
     
-    if event['type'] == 'event_received_message':
-        data = details.get('data', {})
-        message = data.get('message', {})
-        content = message.get('content', '')
-        sender = message.get('name', 'Unknown')
-        
+    if event_type == 'event_received_message':
         if "chat_manager" in source.lower() or "chatmanager" in source.lower():
-            st.markdown(
-                f"""<div style="border-left: 4px solid {ROLE_COLORS['ChatManager']}; 
+            return f"""<div style="border-left: 4px solid {role_colors['ChatManager']}; 
                     padding-left: 10px; background-color: #F8F9FA; 
                     padding: 10px; border-radius: 5px; margin: 5px 0;">
                     <strong>🔄 {timestamp} [Chat Manager]</strong><br>
                     {content}
-                </div>""", 
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(
-                f"""<div style="border-left: 4px solid {color}; 
+                </div>"""
+        return f"""<div style="border-left: 4px solid {color}; 
                     padding-left: 10px; background-color: #FFFFFF; 
                     padding: 10px; border-radius: 5px; margin: 5px 0;">
                     <strong><span style="color: {color}">💬 {timestamp} {sender}</span> → {source}</strong><br>
                     {content}
-                </div>""", 
-                unsafe_allow_html=True
-            )
+                </div>"""
     
-    elif event['type'] in ('llm_call_start', 'llm_call_end'):
-        arrow = "→" if event['type'] == 'llm_call_start' else "←"
-        st.markdown(
-            f"""<div style="border-left: 4px solid {ROLE_COLORS['System']}; 
+    if event_type in ('llm_call_start', 'llm_call_end'):
+        arrow = "→" if event_type == 'llm_call_start' else "←"
+        return f"""<div style="border-left: 4px solid {role_colors['System']}; 
                 padding-left: 10px; background-color: #F0F4FF; 
                 padding: 10px; border-radius: 5px; margin: 5px 0;">
-                <strong>🧠 {timestamp} {source} {arrow} LLM ({details.get('model', 'Unknown')})</strong>
-            </div>""", 
+                <strong>🧠 {timestamp} {source} {arrow} LLM ({model})</strong>
+            </div>"""
+    
+    if event_type == 'function_call':
+        return f"""<div style="border-left: 4px solid {color}; 
+                padding-left: 10px; background-color: #FFF4F4; 
+                padding: 10px; border-radius: 5px; margin: 5px 0;">
+                <strong>🔧 {timestamp} {source} → {function_name}</strong>
+            </div>"""
+    
+    return f"""<div style="border-left: 4px solid {role_colors['System']}; 
+                padding-left: 10px; background-color: #F5F5F5; 
+                padding: 10px; border-radius: 5px; margin: 5px 0;">
+                <strong>⚙️ {timestamp} {source} - Configuration</strong>
+            </div>"""
+
+@functools.lru_cache(maxsize=512)
+def message_bubble_html(sender, role, color, content, time_str, is_system):
+    """Build the chat-view HTML for one message; repeated messages are served from the cache on reruns"""
+    # Create message container with appropriate styling
+    return BUBBLE_TEMPLATE.format_map({
+        'alignment': 'margin-right: auto;' if is_system else 'margin-left: auto;',
+        'background': '#F5F5F5' if is_system else '#FFFFFF',
+        'color': color,
+        'sender': sender,
+        'role': role,
+        'content': content,
+        'time': time_str
+    })
+
+def enhanced_render_event(event):
+    """Enhanced event rendering with role-based styling"""
+    timestamp = event['timestamp'].strftime('%H:%M:%S.%f')[:-3]
+    source = event['source_name']
+    role = event['role']
+    details = event['details']
+    event_type = event['type']
+    
+    if event_type == 'event_received_message':
+        data = details.get('data', {})
+        message = data.get('message', {})
+        st.markdown(
+            event_bubble_html(
+                event_type, timestamp, source, role,
+                sender=str(message.get('name', 'Unknown')),
+                content=str(message.get('content', ''))
+            ),
+            unsafe_allow_html=True
+        )
+    
+    elif event_type in ('llm_call_start', 'llm_call_end'):
+        st.markdown(
+            event_bubble_html(event_type, timestamp, source, role, model=str(details.get('model', 'Unknown'))),
             unsafe_allow_html=True
         )
         with st.expander("Details", expanded=False):
             st.json(details)
     
-    elif event['type'] == 'function_call':
+    elif event_type == 'function_call':
         st.markdown(
-            f"""<div style="border-left: 4px solid {color}; 
-                padding-left: 10px; background-color: #FFF4F4; 
-                padding: 10px; border-radius: 5px; margin: 5px 0;">
-                <strong>🔧 {timestamp} {source} → {details['function_name']}</strong>
-            </div>""", 
+            event_bubble_html(event_type, timestamp, source, role, function_name=str(details['function_name'])),
             unsafe_allow_html=True
         )
         with st.expander("Details", expanded=False):
@@ -421,15 +680,8 @@ def enhanced_render_event(event):
             else:
                 st.json(details['returns'])
     
-    elif event['type'] in ('agent_config', 'client_config', 'wrapper_config'):
-        st.markdown(
-            f"""<div style="border-left: 4px solid {ROLE_COLORS['System']}; 
-                padding-left: 10px; background-color: #F5F5F5; 
-                padding: 10px; border-radius: 5px; margin: 5px 0;">
-                <strong>⚙️ {timestamp} {source} - Configuration</strong>
-            </div>""", 
-            unsafe_allow_html=True
-        )
+    elif event_type in ('agent_config', 'client_config', 'wrapper_config'):
+        st.markdown(event_bubble_html(event_type, timestamp, source, role), unsafe_allow_html=True)
         with st.expander("Details", expanded=False):
             st.json(details['config'])
 
@@ -490,16 +742,27 @@ def display_session_trace(session_events):
             with st.expander(f"⚙️ {timestamp} {source} - Configuration", expanded=False):
                 st.json(details['config'])
 
+def clear_filters():
+    """Reset the chat-view filter widgets to their defaults"""
+    for key in ('role_filter', 'msg_search'):
+        st.session_state.pop(key, None)
+
 def visualize_conversation_flow(session_events):
     """Enhanced visualization of the conversation flow"""
     st.header("💬 Conversation Flow")
     
-    # Extract messages from both event_received_message and chat completions
-    message_events = []
+    # Extract messages from both event_received_message and chat completions,
+    # accumulating one list per column
+    timestamps, senders, receivers, roles, contents, full_contents, types, sources = ([] for _ in range(8))
+    add_timestamp, add_sender, add_receiver, add_role = timestamps.append, senders.append, receivers.append, roles.append
+    add_content, add_full_content, add_type, add_source = contents.append, full_contents.append, types.append, sources.append
     
     for event in session_events:
+        event_type = event['type']
+        source_name = event['source_name']
+        
         # Handle event_received_message
-        if event['type'] == 'event_received_message':
+        if event_type == 'event_received_message':
             data = event['details'].get('data', {})
             if isinstance(data, dict):
                 # Handle both direct message content and nested message structure
@@ -510,43 +773,35 @@ def visualize_conversation_flow(session_events):
                         content = message.get('content', '')
                 
                 if content:
-                    if len(content) > 300:
-                        content = content[:297] + "..."
-                    
-                    message_events.append({
-                        'timestamp': event['timestamp'],
-                        'sender': data.get('name', event['source_name']),
-                        'receiver': event['source_name'],
-                        'role': data.get('name', event['source_name']).split('_')[-1] if '_' in data.get('name', event['source_name']) else data.get('name', event['source_name']),
-                        'content': content,
-                        'full_content': str(content),
-                        'type': 'message',
-                        'source_name': event['source_name']
-                    })
+                    full_content = str(content)
+                    sender = data.get('name', source_name)
+                    add_timestamp(event['timestamp'])
+                    add_sender(sender)
+                    add_receiver(source_name)
+                    add_role(sender.split('_')[-1] if '_' in sender else sender)
+                    add_content(full_content)
+                    add_full_content(full_content)
+                    add_type('message')
+                    add_source(source_name)
         
         # Handle llm_call_start
-        elif event['type'] == 'llm_call_start':
+        elif event_type == 'llm_call_start':
             request = event['details'].get('request', {})
             messages = request.get('messages', [])
             for msg in messages:
                 if isinstance(msg, dict):
-                    content = str(msg.get('content', ''))
-                    if len(content) > 300:
-                        content = content[:297] + "..."
-                    
-                    message_events.append({
-                        'timestamp': event['timestamp'],
-                        'sender': msg.get('role', 'System'),
-                        'receiver': event['source_name'],
-                        'role': msg.get('role', 'System'),
-                        'content': content,
-                        'full_content': str(msg.get('content', '')),
-                        'type': 'message',
-                        'source_name': event['source_name']
-                    })
+                    full_content = str(msg.get('content', ''))
+                    add_timestamp(event['timestamp'])
+                    add_sender(msg.get('role', 'System'))
+                    add_receiver(source_name)
+                    add_role(msg.get('role', 'System'))
+                    add_content(full_content)
+                    add_full_content(full_content)
+                    add_type('message')
+                    add_source(source_name)
         
         # Handle llm_call_end
-        elif event['type'] == 'llm_call_end':
+        elif event_type == 'llm_call_end':
             response = event['details'].get('response', {})
             if isinstance(response, dict):
                 choices = response.get('choices', [])
@@ -554,192 +809,62 @@ def visualize_conversation_flow(session_events):
                     if isinstance(choice, dict):
                         message = choice.get('message', {})
                         if message:
-                            content = str(message.get('content', ''))
-                            if len(content) > 300:
-                                content = content[:297] + "..."
-                            
-                            message_events.append({
-                                'timestamp': event['timestamp'],
-                                'sender': event['source_name'],
-                                'receiver': 'System',
-                                'role': event['source_name'].split('_')[-1] if '_' in event['source_name'] else event['source_name'],
-                                'content': content,
-                                'full_content': str(message.get('content', '')),
-                                'type': 'message',
-                                'source_name': event['source_name']
-                            })
+                            full_content = str(message.get('content', ''))
+                            add_timestamp(event['timestamp'])
+                            add_sender(source_name)
+                            add_receiver('System')
+                            add_role(event['role'])
+                            add_content(full_content)
+                            add_full_content(full_content)
+                            add_type('message')
+                            add_source(source_name)
         
         # Handle function_call
-        elif event['type'] == 'function_call':
-            message_events.append({
-                'timestamp': event['timestamp'],
-                'sender': event['source_name'],
-                'receiver': 'System',
-                'role': event['source_name'].split('_')[-1] if '_' in event['source_name'] else event['source_name'],
-                'content': f"Function call: {event['details'].get('function_name', 'Unknown')}",
-                'full_content': str(event['details']),
-                'type': 'function',
-                'source_name': event['source_name']
-            })
-    
-    if not message_events:
+        elif event_type == 'function_call':
+            add_timestamp(event['timestamp'])
+            add_sender(source_name)
+            add_receiver('System')
+            add_role(event['role'])
+            add_content(f"Function call: {event['details'].get('function_name', 'Unknown')}")
+            add_full_content(str(event['details']))
+            add_type('function')
+            add_source(source_name)
+    
+    if not timestamps:
         st.warning("No conversation messages found in this session")
         return
     
     # Create conversation dataframe
-    conv_df = pd.DataFrame(message_events)
+    conv_df = pd.DataFrame({
+        'timestamp': timestamps,
+        'sender': senders,
+        'receiver': receivers,
+        'role': roles,
+        'content': contents,
+        'full_content': full_contents,
+        'type': types,
+        'source_name': sources
+    }, copy=False)
+    
+    # Truncate long message previews in one vectorized pass
+    content = conv_df['content']
+    is_long = conv_df['type'].eq('message') & content.str.len().gt(300)
+    conv_df['content'] = content.where(~is_long, content.str.slice(0, 297) + "...")
+    
+    # Wrap ``` fenced sections in code blocks once per frame
+    conv_df['processed_content'] = conv_df['content'].str.replace(
+        CODE_FENCE_PATTERN, r'<div class="code-block">\1</div>', regex=True
+    )
+    conv_df[['sender', 'role']] = conv_df[['sender', 'role']].astype('category')
     
     # Debug information
-    st.write(f"Number of messages: {len(message_events)}")
+    st.write(f"Number of messages: {len(conv_df)}")
     st.write("Message types:", conv_df['type'].value_counts().to_dict())
     st.write("Roles:", conv_df['role'].value_counts().to_dict())
     
     # Create two columns for the layout
     col1, col2 = st.columns([2, 1])
     
-    with col1:
-        # Chat-like visualization
-        st.subheader("Chat View")
-        
-        # Add custom CSS for better styling
-        st.markdown("""
-            <style>
-            .chat-container {
-                height: 600px;
-                overflow-y: auto;
-                padding: 15px;
-                background-color: #f8f9fa;
-                border-radius: 10px;
-                border: 1px solid #dee2e6;
-            }
-            .message-bubble {
-                margin: 8px 0;
-                padding: 8px 12px;
-                border-radius: 12px;
-                max-width: 85%;
-                font-size: 0.85em;
-                line-height: 1.3;
-                box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-            }
-            .message-header {
-                font-size: 0.8em;
-                font-weight: 600;
-                margin-bottom: 3px;
-            }
-            .message-content {
-                font-size: 0.85em;
-                line-height: 1.3;
-                white-space: pre-wrap;
-            }
-            .message-time {
-                font-size: 0.7em;
-                color: #666;
-                margin-top: 3px;
-                text-align: right;
-            }
-            .expand-button {
-                font-size: 0.75em;
-                color: #666;
-                cursor: pointer;
-                text-decoration: underline;
-                margin-top: 3px;
-            }
-            .code-block {
-                background-color: #f8f9fa;
-                padding: 8px;
-                border-radius: 4px;
-                font-family: monospace;
-                font-size: 0.8em;
-                margin: 4px 0;
-                overflow-x: auto;
-            }
-            </style>
-        """, unsafe_allow_html=True)
-        
-        # Create the chat container
-        st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-        
-        # Group messages by timestamp to show them in order
-        for _, row in conv_df.sort_values('timestamp').iterrows():
-            # Determine message alignment and styling based on source
-            source_name = row['source_name'].lower()
-            is_system = source_name in ['system', 'initializer']
-            is_ceo = 'ceo' in source_name
-            is_manager = 'chat_manager' in source_name
-            is_cmo = 'cmo' in source_name
-            is_cpo = 'cpo' in source_name
-            is_cto = 'cto' in source_name
-            
-            # Define colors for different roles
-            role_colors = {
-                'ceo': '#FF6B6B',
-                'chat_manager': '#A5A5A5',
-                'cmo': '#FFD166',
-                'cpo': '#06D6A0',
-                'cto': '#4ECDC4',
-                'system': '#8884FF',
-                'initializer': '#8884FF'
-            }
-            
-            # Get the appropriate color
-            color = role_colors.get(source_name, '#CCCCCC')
-            
-            # Process content for code blocks
-            content = row['content']
-            if '```' in content:
-                parts = content.split('```')
-                processed_content = ''
-                for i, part in enumerate(parts):
-                    if i % 2 == 1:  # Code block
-                        processed_content += f'<div class="code-block">{part}</div>'
-                    else:
-                        processed_content += part
-            else:
-                processed_content = content
-            
-            # Create message container with appropriate styling
-            message_style = f"""
-                <div class="message-bubble" style="
-                    {'margin-left: auto;' if not is_system else 'margin-right: auto;'}
-                    background-color: {'#FFFFFF' if not is_system else '#F5F5F5'};
-                    border-left: 3px solid {color};
-                ">
-                    <div class="message-header" style="color: {color};">
-                        {row['sender']} ({row['role']})
-                    </div>
-                    <div class="message-content">
-                        {processed_content}
-                    </div>
-                    <div class="message-time">
-                        {row['timestamp'].strftime('%H:%M:%S')}
-                    </div>
-                    {f'<div class="expand-button" onclick="toggleContent(this)">Show more</div>' if len(row['full_content']) > 300 else ''}
-                </div>
-            """
-            st.markdown(message_style, unsafe_allow_html=True)
-        
-        # Add JavaScript for expand/collapse functionality
-        st.markdown("""
-            <script>
-            function toggleContent(element) {
-                const bubble = element.parentElement;
-                const content = bubble.querySelector('.message-content');
-                const fullContent = bubble.dataset.fullContent;
-                
-                if (element.textContent === 'Show more') {
-                    content.innerHTML = fullContent;
-                    element.textContent = 'Show less';
-                } else {
-                    content.innerHTML = fullContent.substring(0, 297) + '...';
-                    element.textContent = 'Show more';
-                }
-            }
-            </script>
-        """, unsafe_allow_html=True)
-        
-        # Close the chat container
-        st.markdown('</div>', unsafe_allow_html=True)
-    
     with col2:
         # Sidebar with statistics and filters
         st.subheader("Session Statistics")
@@ -754,20 +879,119 @@ def visualize_conversation_flow(session_events):
         time_span = conv_df['timestamp'].max() - conv_df['timestamp'].min()
         st.metric("Conversation Duration", f"{time_span.total_seconds():.1f}s")
         
-        # Add filters
+        # Add filters; read them before rendering so they apply to the chat view
         st.subheader("Filters")
+        role_options = conv_df['role'].cat.categories.tolist()
+        # Keyed widgets keep their value across sessions, so reset when the roles change
+        if st.session_state.get('role_filter_options') != role_options:
+            st.session_state.pop('role_filter', None)
+            st.session_state['role_filter_options'] = role_options
         selected_roles = st.multiselect(
             "Show messages from:",
-            options=conv_df['role'].unique(),
-            default=conv_df['role'].unique()
+            options=role_options,
+            default=role_options,
+            key='role_filter'
         )
         
         # Add a search box
-        search_term = st.text_input("Search in messages:", "")
+        search_term = st.text_input("Search in messages:", "", key='msg_search')
         
-        # Add a clear button
-        if st.button("Clear Filters"):
-            st.experimental_rerun()
+        # Add a clear button; the callback resets the widgets before the next run renders them
+        st.button("Clear Filters", on_click=clear_filters)
+    
+    # Apply the filters to the frame before building any bubbles
+    mask = conv_df['role'].isin(selected_roles)
+    if search_term:
+        mask &= conv_df['full_content'].str.contains(search_term, case=False, regex=False, na=False)
+    filtered_df = conv_df[mask]
+    
+    with col1:
+        # Chat-like visualization
+        st.subheader("Chat View")
+        
+        # Add custom CSS for better styling
+        st.markdown(CHAT_CSS, unsafe_allow_html=True)
+        
+        role_colors = CHAT_ROLE_COLORS
+        bubbles = []
+        
+        # Group messages by timestamp to show them in order
+        ordered = filtered_df.sort_values('timestamp')
+        
+        # Only render the newest window of messages; older ones load on demand
+        shown = st.session_state.setdefault('msg_window', MESSAGE_PAGE_SIZE)
+        if len(ordered) > shown:
+            if st.button("Load older", key="load_older"):
+                shown = st.session_state['msg_window'] = shown + MESSAGE_PAGE_SIZE
+            st.caption(f"Showing the latest {min(shown, len(ordered))} of {len(ordered)} messages")
+            ordered = ordered.tail(shown)
+        source_names = ordered['source_name'].str.lower().to_numpy()
+        time_strs = ordered['timestamp'].dt.strftime('%H:%M:%S').to_numpy()
+        for source_name, sender, role, content, time_str in zip(
+            source_names, ordered['sender'].to_numpy(), ordered['role'].to_numpy(),
+            ordered['processed_content'].to_numpy(), time_strs
+        ):
+            # Determine message alignment and color based on source
+            is_system = source_name in ('system', 'initializer')
+            color = role_colors.get(source_name, '#CCCCCC')
+            bubbles.append(message_bubble_html(sender, role, color, content, time_str, is_system))
+        
+        # Emit every bubble and the container in one element
+        st.markdown(
+            '<div class="chat-container">\n' + "\n".join(bubbles) + '\n</div>',
+            unsafe_allow_html=True
+        )
+
+@st.cache_data(max_entries=4, show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def analytics_aggregates(cc):
+    """Aggregate chat completions once per dataset for every analytics chart"""
+    return {
+        'by_session': cc.groupby('session_id', observed=True, sort=False)['cost'].sum().nlargest(20),
+        # Keep dates sorted so the trend line is drawn in order
+        'by_date': cc.groupby('date')['cost'].sum(),
+        'by_model': cc.groupby('model', observed=True, sort=False)['total_tokens'].sum(),
+        'by_hour': cc.groupby('hour', sort=False)['total_tokens'].sum()
+    }
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def session_cost_figure(session_costs):
+    """Bar chart of the most expensive sessions"""
+    return px.bar(
+        x=session_costs.index,
+        y=session_costs.values,
+        title='Top 20 Sessions by Cost',
+        labels={'y': 'Total Cost ($)', 'x': 'Session ID'}
+    )
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def daily_cost_figure(daily_costs):
+    """Line chart of cost per day"""
+    return px.line(
+        x=daily_costs.index,
+        y=daily_costs.values,
+        title='Daily Cost Trend',
+        labels={'y': 'Total Cost ($)', 'x': 'Date'}
+    )
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def model_tokens_figure(model_tokens):
+    """Bar chart of tokens per model"""
+    return px.bar(
+        x=model_tokens.index,
+        y=model_tokens.values,
+        title='Total Tokens by Model',
+        labels={'y': 'Total Tokens', 'x': 'Model'}
+    )
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def hourly_tokens_figure(hourly_tokens):
+    """Bar chart of tokens per hour of day"""
+    return px.bar(
+        x=hourly_tokens.index,
+        y=hourly_tokens.values,
+        title='Hourly Token Usage',
+        labels={'y': 'Total Tokens', 'x': 'Hour of Day'}
+    )
 
 def display_analytics_view(tables):
     """Display the aggregated analytics view"""
@@ -775,6 +999,7 @@ def display_analytics_view(tables):
     
     # Get chat completions data
     cc = tables['chat_completions']
+    aggregates = analytics_aggregates(cc)
     
     # Overview metrics
     st.subheader("Overview")
@@ -786,58 +1011,29 @@ def display_analytics_view(tables):
     with col3:
         st.metric("Total Cost", f"${cc['cost'].sum():.2f}")
     
-    # Cost analysis
+    # Cost analysis; like tabs, but only the selected chart is built and sent to the browser
     st.subheader("Cost Analysis")
-    tab1, tab2 = st.tabs(["By Session", "Over Time"])
-    
-    with tab1:
-        session_costs = cc.groupby('session_id')['cost'].sum().reset_index()
-        fig1 = px.bar(
-            session_costs.sort_values('cost', ascending=False).head(20),
-            x='session_id',
-            y='cost',
-            title='Top 20 Sessions by Cost',
-            labels={'cost': 'Total Cost ($)', 'session_id': 'Session ID'}
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-    
-    with tab2:
-        daily_costs = cc.groupby('date')['cost'].sum().reset_index()
-        fig2 = px.line(
-            daily_costs,
-            x='date',
-            y='cost',
-            title='Daily Cost Trend',
-            labels={'cost': 'Total Cost ($)', 'date': 'Date'}
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+    cost_view = st.radio(
+        "Cost view", ["By Session", "Over Time"],
+        horizontal=True, label_visibility="collapsed", key="cost_view"
+    )
+    
+    if cost_view == "By Session":
+        st.plotly_chart(session_cost_figure(aggregates['by_session']), use_container_width=True, config=HOVER_CHART_CONFIG)
+    else:
+        st.plotly_chart(daily_cost_figure(aggregates['by_date']), use_container_width=True, config=HOVER_CHART_CONFIG)
     
     # Token analysis
     st.subheader("Token Usage")
-    tab1, tab2 = st.tabs(["By Model", "Over Time"])
-    
-    with tab1:
-        model_tokens = cc.groupby(cc['request_dict'].apply(lambda x: x.get('model', 'Unknown')))['total_tokens'].sum().reset_index()
-        fig3 = px.bar(
-            model_tokens,
-            x='request_dict',
-            y='total_tokens',
-            title='Total Tokens by Model',
-            labels={'total_tokens': 'Total Tokens', 'request_dict': 'Model'}
-        )
-        st.plotly_chart(fig3, use_container_width=True)
-    
-    with tab2:
-        cc['hour'] = cc['start_time'].dt.hour
-        hourly_tokens = cc.groupby('hour')['total_tokens'].sum().reset_index()
-        fig4 = px.bar(
-            hourly_tokens,
-            x='hour',
-            y='total_tokens',
-            title='Hourly Token Usage',
-            labels={'total_tokens': 'Total Tokens', 'hour': 'Hour of Day'}
-        )
-        st.plotly_chart(fig4, use_container_width=True)
+    token_view = st.radio(
+        "Token view", ["By Model", "Over Time"],
+        horizontal=True, label_visibility="collapsed", key="token_view"
+    )
+    
+    if token_view == "By Model":
+        st.plotly_chart(model_tokens_figure(aggregates['by_model']), use_container_width=True, config=STATIC_CHART_CONFIG)
+    else:
+        st.plotly_chart(hourly_tokens_figure(aggregates['by_hour']), use_container_width=True, config=STATIC_CHART_CONFIG)
 
 def main():
     """Main application function"""
@@ -852,7 +1048,7 @@ def main():
     
     if uploaded_file is not None:
         # Load and process data
-        tables = load_database(uploaded_file)
+        tables = load_database(uploaded_file.getvalue())
         if tables is None:
             return
         
@@ -860,11 +1056,7 @@ def main():
         session_data = build_unified_session_view(tables)
         
         # Calculate session metrics
-        all_session_metrics = [
-            calculate_session_metrics(sid, events, tables['chat_completions'])
-            for sid, events in session_data.items()
-        ]
-        metrics_df = pd.DataFrame(all_session_metrics)
+        metrics_df = calculate_all_session_metrics(tables)
         
         # Add toggle for enhanced view
         enhanced_view = st.sidebar.checkbox("Enhanced Conversation View", value=True)
@@ -879,15 +1071,26 @@ def main():
         if view_mode == "Session Trace":
             # Session selection
             if not metrics_df.empty:
+                # Index by session id so the selected row is a hash lookup
+                metrics_df = metrics_df.set_index('session_id', drop=False)
+                
+                # Build the option list and status lookup once instead of per option
+                status_map = dict(zip(metrics_df['session_id'], metrics_df['status']))
+                session_ids_sorted = metrics_df.sort_values('start_time', ascending=False).index.tolist()
                 selected_session = st.sidebar.selectbox(
                     "Select Session",
-                    options=metrics_df.sort_values('start_time', ascending=False)['session_id'],
-                    format_func=lambda x: f"{x} ({metrics_df[metrics_df['session_id']==x]['status'].iloc[0]})",
+                    options=session_ids_sorted,
+                    format_func=lambda x: f"{x} ({status_map[x]})",
                     key="session_selector"
                 )
                 
+                # Start each newly selected session from the latest message window
+                if st.session_state.get('prev_session') != selected_session:
+                    st.session_state['msg_window'] = MESSAGE_PAGE_SIZE
+                    st.session_state['prev_session'] = selected_session
+                
                 # Display selected session
-                session_metrics = metrics_df[metrics_df['session_id'] == selected_session].iloc[0]
+                session_metrics = metrics_df.loc[selected_session]
                 
                 # Add tabs for different views
                 tab1, tab2 = st.tabs(["Conversation Flow", "Detailed Trace"])
@@ -911,5 +1114,42 @@ def main():
     else:
         st.info("Please upload a SQLite database file to begin analysis")
 
+def display_cache_stats():
+    """Show hit/miss counts for the in-process memo caches"""
+    caches = {
+        'JSON parsing': _cached_loads,
+        'Trace bubbles': event_bubble_html,
+        'Chat bubbles': message_bubble_html
+    }
+    stats = pd.DataFrame(
+        [(name, *cache.cache_info()) for name, cache in caches.items()],
+        columns=['cache', 'hits', 'misses', 'max size', 'size']
+    )
+    with st.sidebar.expander("Cache stats"):
+        st.dataframe(stats, hide_index=True)
+
+def profile_render(render):
+    """Run one render under pyinstrument (optional dependency) and show the timings in the sidebar"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        st.sidebar.warning("Install pyinstrument to profile renders: pip install pyinstrument")
+        render()
+        display_cache_stats()
+        return
+    
+    profiler = Profiler()
+    profiler.start()
+    try:
+        render()
+    finally:
+        profiler.stop()
+    with st.sidebar.expander("Render profile"):
+        st.code(profiler.output_text(unicode=True, color=False))
+    display_cache_stats()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if st.sidebar.checkbox("Profile render", key="profile_render"):
+        profile_render(main)
+    else:
+        main()
\ No newline at end of file